@@ -1,106 +1,284 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
+import os
+import tempfile
+from collections import Counter, defaultdict
+from itertools import chain
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Load JSON file
 file_path = "lobbying_data.json"
-with open(file_path, "r") as file:
-    data = json.load(file)
+# Prepared frame cached on disk between sessions
+parquet_path = "lobbying_data_json.parquet"
+
+# Fields used by the app: top-level ones are kept as-is, nested ones become
+# prefixed columns (e.g. "registrant_name")
+top_level_keys = ["filing_year", "filing_type_display", "filing_document_url", "foreign_entities", "lobbying_activities"]
+nested_keys = {"registrant": ["name", "description"], "client": ["name"]}
 
-# Flatten JSON data
-df = pd.json_normalize(data, sep="_")
+def to_columns(data):
+    """Collect the fields the app uses from every filing into one list per column."""
+    columns = {key: [] for key in top_level_keys}
+    columns.update({f"{obj}_{field}": [] for obj, fields in nested_keys.items() for field in fields})
+    for record in data:
+        for key in top_level_keys:
+            columns[key].append(record.get(key))
+        for obj, fields in nested_keys.items():
+            nested = record.get(obj) or {}
+            for field in fields:
+                columns[f"{obj}_{field}"].append(nested.get(field))
+    return columns
 
 # Handle missing values safely
-def extract_lobbyists(activity_list):
-    """Extract lobbyists' names safely."""
-    if isinstance(activity_list, list):
-        return [
-            f"{lobbyist['lobbyist'].get('first_name', '')} {lobbyist['lobbyist'].get('last_name', '')}".strip()
-            for activity in activity_list if 'lobbyists' in activity and isinstance(activity["lobbyists"], list)
-            for lobbyist in activity["lobbyists"]
-        ]
-    return []
-
-def extract_covered_positions(activity_list):
-    """Extract covered positions from lobbyists."""
-    if isinstance(activity_list, list):
-        return [
-            lobbyist.get("covered_position", "N/A")
-            for activity in activity_list if 'lobbyists' in activity and isinstance(activity["lobbyists"], list)
-            for lobbyist in activity["lobbyists"]
-        ]
-    return []
-
-df["registrant_type"] = df["registrant_description"].fillna("Unknown")
-df["foreign_entities"] = df["foreign_entities"].apply(lambda x: [e["name"] for e in x] if isinstance(x, list) else [])
-df["lobbyists"] = df["lobbying_activities"].apply(extract_lobbyists)
-df["covered_positions"] = df["lobbying_activities"].apply(extract_covered_positions)
-
-# Select key columns
-columns_to_display = [
-    "filing_year",
-    "filing_type_display",
-    "registrant_name",
-    "registrant_type",
-    "client_name",
-    "lobbyists",
-    "covered_positions",
-    "foreign_entities",
-]
-
-df_filtered = df[columns_to_display]
+def extract_lobbyists_and_positions(activity_list):
+    """Extract lobbyists' names and covered positions in a single pass."""
+    if not activity_list or not isinstance(activity_list, list):
+        return [], []
+    names = []
+    positions = []
+    for activity in activity_list:
+        lobbyists = activity.get("lobbyists")
+        if not isinstance(lobbyists, list):
+            continue
+        for lobbyist in lobbyists:
+            person = lobbyist["lobbyist"]
+            names.append(f"{person.get('first_name', '')} {person.get('last_name', '')}".strip())
+            positions.append(lobbyist.get("covered_position", "N/A"))
+    return names, positions
+
+
+def extract_foreign_entities(entity_list):
+    """Extract foreign entity names safely."""
+    if not entity_list or not isinstance(entity_list, list):
+        return []
+    return [entity["name"] for entity in entity_list]
+
+
+def contains_any(list_column, values):
+    """Mask rows whose list column contains any of the given values."""
+    return (
+        list_column.explode()
+        .isin(values)
+        .groupby(level=0)
+        .any()
+        .reindex(list_column.index, fill_value=False)
+    )
+
+def category_mask(column, values):
+    """Mask rows of a categorical column holding any of the given values, comparing codes."""
+    codes = column.cat.categories.get_indexer(values)
+    return np.isin(column.cat.codes.to_numpy(), codes[codes >= 0])
+
+def count_list_values(list_column):
+    """Count how often each value appears across a list column, most frequent first."""
+    counts = Counter(value for value in chain.from_iterable(list_column) if pd.notna(value))
+    return (
+        pd.Series(counts, dtype="int64", name="count")
+        .sort_values(ascending=False)
+        .rename_axis(list_column.name)
+    )
+
+def build_df() -> pd.DataFrame:
+    """Load, flatten and prepare the lobbying data from the JSON file."""
+    with open(file_path, "rb") as file:
+        # orjson is considerably faster on large files; fall back to the stdlib parser
+        data = orjson.loads(file.read()) if orjson is not None else json.load(file)
+
+    # Flatten JSON data
+    df = pd.DataFrame(to_columns(data))
+    # Sort by year once (stable, so filings keep their order within a year)
+    df = df.sort_values("filing_year", kind="mergesort").reset_index(drop=True)
+
+    df["registrant_type"] = df["registrant_description"].fillna("Unknown")
+    df["foreign_entities"] = df["foreign_entities"].map(extract_foreign_entities)
+    df[["lobbyists", "covered_positions"]] = pd.DataFrame(
+        df["lobbying_activities"].map(extract_lobbyists_and_positions).tolist(),
+        index=df.index,
+        columns=["lobbyists", "covered_positions"],
+    )
+
+    # Low-cardinality text columns that are filtered and counted on every rerun
+    for column in ["registrant_name", "client_name", "registrant_type", "filing_type_display"]:
+        df[column] = df[column].astype("category")
+    # Arrow-backed strings for the remaining high-cardinality text
+    df["filing_document_url"] = df["filing_document_url"].astype("string[pyarrow]")
+
+    # Select key columns
+    columns_to_display = [
+        "filing_year",
+        "filing_type_display",
+        "registrant_name",
+        "registrant_type",
+        "client_name",
+        "lobbyists",
+        "covered_positions",
+        "foreign_entities",
+        "filing_document_url",
+    ]
+
+    return df[columns_to_display]
+
+
+def read_cached_df():
+    """Read the Parquet cache, or return None if it is missing, stale or unreadable."""
+    try:
+        source_mtime = max(os.path.getmtime(file_path), os.path.getmtime(__file__))
+        if os.path.getmtime(parquet_path) < source_mtime:
+            return None
+        df = pd.read_parquet(parquet_path)
+    except (OSError, ValueError):
+        # A missing, truncated or corrupt cache is simply rebuilt from the JSON
+        return None
+    # Parquet hands list columns back as arrays...
+    for column in ["lobbyists", "covered_positions", "foreign_entities"]:
+        df[column] = df[column].map(list)
+    # ...and Arrow-backed strings as Python-backed ones
+    for column in df.select_dtypes("string").columns:
+        df[column] = df[column].astype("string[pyarrow]")
+    return df
+
+
+def write_cached_df(df):
+    """Atomically replace the Parquet cache, skipping it if it can't be written."""
+    directory = os.path.dirname(os.path.abspath(parquet_path))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".parquet")
+    except OSError:
+        # e.g. a read-only deploy directory; the in-memory cache still applies
+        return
+    try:
+        # Write beside the cache and swap it in, so readers never see a partial file
+        with os.fdopen(fd, "wb") as file:
+            df.to_parquet(file)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates the file as owner-only
+        os.replace(tmp_path, parquet_path)
+    except (OSError, ValueError, TypeError):
+        # Includes pyarrow failing to convert a column (ArrowInvalid is a ValueError);
+        # the cache is optional, so the freshly built frame is used as is
+        pass
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass  # normally already moved into place
+
+
+@st.cache_data(show_spinner=False)
+def load_df() -> pd.DataFrame:
+    """Read the prepared frame from Parquet, rebuilding it when the JSON or this script is newer."""
+    df = read_cached_df()
+    if df is None:
+        df = build_df()
+        write_cached_df(df)
+    return df
+
+
+@st.cache_data(show_spinner=False)
+def year_options() -> list:
+    """Filing years for the sidebar, already in order since load_df() sorts by year."""
+    return load_df()["filing_year"].dropna().unique().tolist()
+
+
+@st.cache_data(show_spinner=False)
+def list_column_options(column: str) -> list:
+    """Sorted unique values of a list column, used to populate the sidebar."""
+    return np.sort(load_df()[column].explode().dropna().unique()).tolist()
+
+
+@st.cache_data(show_spinner=False)
+def lobbyist_rows() -> dict:
+    """Map each lobbyist to the row positions of the filings that list them."""
+    rows = defaultdict(list)
+    for i, names in enumerate(load_df()["lobbyists"]):
+        for name in set(names):
+            rows[name].append(i)
+    return {name: np.array(positions, dtype=np.int64) for name, positions in rows.items()}
+
+
+def apply_filters(df, years, clients, registrants, foreign_entities, lobbyist):
+    """Narrow the prepared frame down to the sidebar selections."""
+    if years:
+        df = df[df["filing_year"].isin(years)]
+
+    if clients:
+        df = df[category_mask(df["client_name"], clients)]
+
+    if registrants:
+        df = df[category_mask(df["registrant_name"], registrants)]
+
+    if foreign_entities:
+        df = df[contains_any(df["foreign_entities"], foreign_entities)]
+
+    if lobbyist:
+        # load_df() keeps a RangeIndex, so row positions double as index labels
+        df = df[df.index.isin(lobbyist_rows()[lobbyist])]
+
+    return df
+
+
+# Bounded, since every distinct combination of sidebar selections is its own entry
+@st.cache_data(show_spinner=False, max_entries=64, ttl=3600)
+def filter_data(years, clients, registrants, foreign_entities, lobbyist):
+    """Filtered frame and its year, covered position and foreign entity counts for one selection."""
+    df_filtered = apply_filters(load_df(), years, clients, registrants, foreign_entities, lobbyist)
+    return (
+        df_filtered,
+        df_filtered["filing_year"].value_counts(),
+        count_list_values(df_filtered["covered_positions"]),
+        count_list_values(df_filtered["foreign_entities"]),
+    )
+
+
+df = load_df()
 
 # Streamlit UI
 st.title("Lobbying Data Explorer")
 
 # Sidebar Filters
-year_filter = st.sidebar.multiselect("Select Year(s)", sorted(df_filtered["filing_year"].dropna().unique()))
-client_filter = st.sidebar.multiselect("Select Client(s)", sorted(df_filtered["client_name"].dropna().unique()))
-registrant_filter = st.sidebar.multiselect("Select Registrant(s)", sorted(df_filtered["registrant_name"].dropna().unique()))
-foreign_filter = st.sidebar.multiselect("Select Foreign Entity", sorted(set([e for sublist in df_filtered["foreign_entities"] for e in sublist])))
+year_filter = st.sidebar.multiselect("Select Year(s)", year_options())
+client_filter = st.sidebar.multiselect("Select Client(s)", df["client_name"].cat.categories.tolist())
+registrant_filter = st.sidebar.multiselect("Select Registrant(s)", df["registrant_name"].cat.categories.tolist())
+foreign_filter = st.sidebar.multiselect("Select Foreign Entity", list_column_options("foreign_entities"))
 
 # Flatten lobbyists for dropdown selection in sidebar
-lobbyist_list = sorted(set([lobbyist for sublist in df_filtered["lobbyists"] for lobbyist in sublist]))
+lobbyist_list = list_column_options("lobbyists")
 lobbyist_filter = st.sidebar.selectbox("Select Lobbyist", [""] + lobbyist_list)
 
 # Apply filters
-if year_filter:
-    df_filtered = df_filtered[df_filtered["filing_year"].isin(year_filter)]
-
-if client_filter:
-    df_filtered = df_filtered[df_filtered["client_name"].isin(client_filter)]
-
-if registrant_filter:
-    df_filtered = df_filtered[df_filtered["registrant_name"].isin(registrant_filter)]
-
-if foreign_filter:
-    df_filtered = df_filtered[df_filtered["foreign_entities"].apply(lambda x: any(entity in x for entity in foreign_filter))]
-
-if lobbyist_filter:
-    df_filtered = df_filtered[df_filtered["lobbyists"].apply(lambda x: lobbyist_filter in x)]
+selections = (tuple(year_filter), tuple(client_filter), tuple(registrant_filter), tuple(foreign_filter), lobbyist_filter)
+df_filtered, year_counts, position_counts, foreign_counts = filter_data(*selections)
 
 # Display Data
-st.dataframe(df_filtered)
+st.dataframe(
+    df_filtered,
+    column_config={"filing_document_url": st.column_config.LinkColumn("Filing", display_text="View Filing")},
+)
 
 # Display a Bar Chart of Registrations per Year
 st.subheader("Lobbying Registrations Per Year")
-st.bar_chart(df_filtered["filing_year"].value_counts())
+st.bar_chart(year_counts)
 
 
 # Display Lobbyists' Covered Positions
 st.subheader("Covered Positions of Lobbyists")
-st.write(df_filtered.explode("covered_positions")["covered_positions"].dropna().value_counts())
+st.write(position_counts)
 
 # Display Foreign Entities Involved
 st.subheader("Foreign Entities Mentioned")
-st.write(df_filtered.explode("foreign_entities")["foreign_entities"].dropna().value_counts())
+st.write(foreign_counts)
 
 # Show lobbyist details if selected
 if lobbyist_filter:
     st.write(f"### Details for {lobbyist_filter}")
 
     # Get filtered data for the selected lobbyist
-    lobbyist_info = df[df["lobbyists"].apply(lambda x: lobbyist_filter in x)]
+    lobbyist_info = df.iloc[lobbyist_rows()[lobbyist_filter]]
     
     # Show companies they lobbied for
     st.subheader("Companies Lobbied For")